@@ -1,19 +1,21 @@
-from numba import jit
+from numba import njit
 import numpy as np
 
 class memTWED():
     """
     Calculates the "Time-Warped Edit Distance" following Marteau (2009), S. 312.
-    Anyhow, for less memory usage only a matrix of shape (2, m) is created.
+    Anyhow, for less memory usage only two rows of the matrix (prev, curr) are kept.
     
     @t1: Flat Numpy-array containing the data of the first time-series.
     @t2: Flat Numpy-array containing the data of the second time-series.
     @_lambda: Penalty for deletion.
     @_nu: Elasticity. _nu has to be >=0.
+    @band: Width of the Sakoe-Chiba band, i.e. only cells with |i-j| <= band are computed. band has to be >= |n-m|.
+           None computes the entire matrix.
     
     Other variables:
-    n: int, m: int -> length of t1, t2
-    matrix: np.array with shape (2,m)
+    n: int, m: int -> length of t1, t2 (t1 and t2 are swapped if n < m, hence always m <= n)
+    prev: np.array, curr: np.array -> Previous and current row of the matrix, each of length m
     
     ____
     Use like:
@@ -23,17 +25,17 @@ class memTWED():
     ```
     """
     
-    __slots__ = ["t1", "t2", "_lambda", "_nu", "n", "m"]
+    __slots__ = ["t1", "t2", "_lambda", "_nu", "n", "m", "band"]
     
     _LAMBDA = 0.001
     _NU = 0.5
     
-    def __init__(self, t1: np.array, t2: np.array, _lambda: float = _LAMBDA, _nu: float = _NU, failOnDifferingLengths: bool = False) -> None:
+    def __init__(self, t1: np.array, t2: np.array, _lambda: float = _LAMBDA, _nu: float = _NU, failOnDifferingLengths: bool = False, band: int = None) -> None:
         
         assert _nu >= 0, "Error: Set _nu >= 0!"
         
-        self.t1      = t1
-        self.t2      = t2
+        self.t1      = np.ascontiguousarray(t1, dtype=np.float64)
+        self.t2      = np.ascontiguousarray(t2, dtype=np.float64)
         self._lambda = _lambda
         self._nu     = _nu
         
@@ -43,74 +45,159 @@ class memTWED():
         if failOnDifferingLengths:
             assert self.n == self.m, f"Error, n != m!: {self.n}, {self.m}"
         elif self.n < self.m:
-            print("Warning: n < m will result in long runtimes!")
+            #TWED is symmetric, hence swap the series so that the rows have the shorter length m <= n
+            self.t1, self.t2 = self.t2, self.t1
+            self.n,  self.m  = self.m,  self.n
         
+        assert self.m > 0, "Error: Pass non-empty time-series!"
         
-    def _init_matrix(self) -> np.array:
+        self.band    = self.n if band is None else band
+        assert self.band >= self.n - self.m, f"Error: Set band >= |n-m|!: {self.band}, {self.n - self.m}"
+        
+        
+    def _init_matrix(self) -> tuple:
         """
-        Initialize matrix for operations.
+        Allocate the two rows (prev, curr) for operations. They are initialized by _calculateCosts(),
+        hence can be reused for several calculations (see pairwiseTWED).
         """
-        matrix = np.zeros((2, self.n))
-        
-        matrix[0, :] = np.inf
-        matrix[:, 0] = np.inf
-        matrix[0, 0] = 0
+        prev = np.empty(self.m, dtype=np.float64)
+        curr = np.empty(self.m, dtype=np.float64)
         
-        return matrix
+        return prev, curr
 
     
-    def calculateCosts(self):
+    def calculateCosts(self) -> float:
         """
         Calculates the resulting costs according to TWED (hence, dissimilarity between t1 and t2).
         Returns the costs.
             
-        matrix  = self._init_matrix()         #DP
+        prev, curr = self._init_matrix()      #DP (previous, current row)
         nu      = self._nu                    #Elasticity
         n       = self.n                      #Number of timesteps in t1
         m       = self.m                      #Number of timesteps in t2
         lam     = self._lambda                #Penalty for deletion
         t1_data = self.t1                     #Time-series data for t1
         t2_data = self.t2                     #Time-series data for t2
+        dt1     = np.abs(np.diff(self.t1))    #|t1[i-1] - t1[i]|
+        dt2     = np.abs(np.diff(self.t2))    #|t2[j-1] - t2[j]|
+        band    = self.band                   #Sakoe-Chiba band
         """
-        return self._calculateCosts(self._init_matrix(), self.n, self.m, self._nu, self._lambda, self.t1, self.t2)
+        return _calculateCosts(
+                    *self._init_matrix(), self.n, self.m, self._nu, self._lambda, self.t1, self.t2,
+                    np.abs(np.diff(self.t1)), np.abs(np.diff(self.t2)), self.band
+        )
+
+
+#No 'ninf'/'nnan' fastmath-flags: the DP relies on np.inf as boundary value
+@njit("f8(f8[::1], f8[::1], i8, i8, f8, f8, f8[::1], f8[::1], f8[::1], f8[::1], i8)", nogil=True, cache=True, fastmath={'nsz', 'arcp', 'contract', 'afn', 'reassoc'}, boundscheck=False)
+def _calculateCosts(prev, curr, n, m, nu, lam, t1_data, t2_data, dt1, dt2, band) -> float:
+    """
+    JIT-function wrapped by memTWED.calculateCosts() and pairwiseTWED().
+    Does not allocate any memory: prev and curr are (re-)initialized in place.
+    """
+    prev[0]  = 0
+    prev[1:] = np.inf
     
+    nu_lam = nu + lam                     #Constant part of the deletion costs
+    two_nu = 2*nu                         #Elasticity of the matching costs
     
-    @staticmethod
-    @jit
-    def _calculateCosts(matrix, n, m, nu, lam, t1_data, t2_data) -> np.float:
-        """
-        JIT-function wrapped by self.calculateCosts().
-        """
-        _abs    = np.abs                      #Distance-measure (LP)
+    for i in range(1, n):
+        jlo = max(1, i - band)     #First column within the band
+        jhi = min(m, i + band + 1) #First column after the band
+        
+        curr[jlo-1] = np.inf
+        d1 = dt1[i-1] + nu_lam #Independent of j
         
+        left = np.inf        #curr[j-1], carried in a register
+        diag = prev[jlo-1]   #prev[j-1], carried in a register
         
-        for i in range(1, n):
-            mi = i % 2 #Current Row
-            ai = abs(mi-1) #Previous Row
+        for j in range(jlo, jhi):
+            up = prev[j]
             
-            for j in range(1, m):
-                
-                _deleteA = (
-                            matrix[ai, j] + 
-                            _abs(t1_data[i-1] - t1_data[i]) +
-                            nu*(i - (i-1)) + lam
-                )
-                _deleteB = (
-                            matrix[mi, j-1] + 
-                            _abs(t2_data[j-1] - t2_data[j]) +
-                            nu*(j - (j-1)) + lam
-                )
-                _match = (
-                            matrix[ai, j-1] + 
-                            _abs(t1_data[i] - t2_data[j]) +
-                            _abs(t1_data[i-1] - t2_data[j-1]) +
-                            nu*(
-                                _abs(i - j) + 
-                                _abs((i-1) - (j-1))
-                            ) 
-                )
-                matrix[mi, j] = min(_deleteA, _deleteB, _match)
-            else:
-                matrix[0, 0] = np.inf
+            _deleteA = (
+                        up + 
+                        d1
+            )
+            _deleteB = (
+                        left + 
+                        dt2[j-1] +
+                        nu_lam
+            )
+            _match = (
+                        diag + 
+                        abs(t1_data[i] - t2_data[j]) +
+                        abs(t1_data[i-1] - t2_data[j-1]) +
+                        two_nu*abs(i - j) #nu*(|i-j| + |(i-1)-(j-1)|)
+            )
+            _delete = _deleteA if _deleteA < _deleteB else _deleteB #Branchless min (minsd)
+            left    = _delete if _delete < _match else _match
+            curr[j] = left
+            diag    = up
+        
+        if jhi < m:
+            curr[jhi] = np.inf #Read by the next row, which reaches one column further
+        
+        prev, curr = curr, prev #Swap rows
+
+    return prev[m-1]    #-> Costs
+
+
+def pairwiseTWED(X: np.array, Y: np.array = None, _lambda: float = memTWED._LAMBDA, _nu: float = memTWED._NU, band: int = None) -> np.array:
+    """
+    Calculates the "Time-Warped Edit Distance" (see memTWED) between all pairs of time-series in X,
+    or between every series in X and every series in Y.
+    The rows of the matrix and the differences of the series are allocated only once and reused for every pair.
+    
+    @X: Numpy-array in shape (number_of_time_series, length_time_series).
+    @Y: Numpy-array in shape (number_of_time_series, length_time_series). If None, X is compared against itself.
+    @_lambda: Penalty for deletion.
+    @_nu: Elasticity. _nu has to be >=0.
+    @band: Width of the Sakoe-Chiba band (see memTWED).
+    
+    Returns the costs as matrix in shape (len(X), len(Y)).
+    
+    ____
+    Use like:
+    ```python
+    
+    pairwiseTWED(np.random.rand(10, 50))
+    ```
+    """
+    assert _nu >= 0, "Error: Set _nu >= 0!"
+    
+    symmetric = Y is None
+    X         = np.ascontiguousarray(X, dtype=np.float64)
+    Y         = X if symmetric else np.ascontiguousarray(Y, dtype=np.float64)
+    
+    assert X.ndim == 2 and Y.ndim == 2, f"Error: Pass X and Y as matrices! Currently have shapes {X.shape}, {Y.shape}."
+    
+    if X.shape[1] < Y.shape[1]:
+        #TWED is symmetric, hence let the rows of the matrix have the shorter length (see memTWED)
+        return pairwiseTWED(Y, X, _lambda, _nu, band).T
+    
+    n, m = X.shape[1], Y.shape[1]
+    assert m > 0, "Error: Pass non-empty time-series!"
+    band = n if band is None else band
+    assert band >= n - m, f"Error: Set band >= |n-m|!: {band}, {n - m}"
+    
+    dX         = np.abs(np.diff(X))           #|x[i-1] - x[i]| of every series
+    dY         = dX if symmetric else np.abs(np.diff(Y))
+    prev, curr = np.empty(m, dtype=np.float64), np.empty(m, dtype=np.float64) #DP (previous, current row)
+    costs      = np.zeros((len(X), len(Y)), dtype=np.float64)
+    
+    _pairwiseCosts(costs, prev, curr, n, m, _nu, _lambda, X, Y, dX, dY, band, symmetric)
+    
+    if symmetric:
+        costs += costs.T
+    
+    return costs    #-> Costs
+
 
-        return matrix[mi, m-1]    #-> Costs
+@njit("void(f8[:, ::1], f8[::1], f8[::1], i8, i8, f8, f8, f8[:, ::1], f8[:, ::1], f8[:, ::1], f8[:, ::1], i8, b1)", nogil=True, cache=True)
+def _pairwiseCosts(costs, prev, curr, n, m, nu, lam, X, Y, dX, dY, band, symmetric) -> None:
+    """
+    JIT-function wrapped by pairwiseTWED(). Writes the costs of every pair into costs.
+    """
+    for a in range(X.shape[0]):
+        for b in range(a+1 if symmetric else 0, Y.shape[0]):
+            costs[a, b] = _calculateCosts(prev, curr, n, m, nu, lam, X[a], Y[b], dX[a], dY[b], band)
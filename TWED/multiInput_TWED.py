@@ -1,9 +1,10 @@
+from numba import cuda, njit, prange
 import numpy as np
 
 class multiTWED():
     """
     Calculates the "Time-Warped Edit Distance" following Marteau (2009), S. 312.
-    Anyhow, for less memory usage only a matrix of shape (2, m) is created (see memTWED).
+    Anyhow, for less memory usage only two rows of the matrix are kept per series (see memTWED).
     Furthermore, multiTWED allows to comapre the series t1 against multiple other time-series.
     Hence, t2 has to be provided as matrix in shape (number_of_time_series, length_time_series).
     
@@ -16,7 +17,7 @@ class multiTWED():
     
     Other variables:
     n: int, m: int -> length of t1, t2
-    matrix: np.array with shape (self.numSeries, 2, self.n)
+    numSeries: int -> number of time-series in t2, which are processed in parallel
     
     ____
     Use like:
@@ -24,6 +25,8 @@ class multiTWED():
     
     multiTWED(np.arange(1,5,1), np.tile(np.arange(11,15,1), (3,1))).calculateCosts()
     ```
+    
+    For many series (numSeries >= ~128) and an available CUDA device, use calculateCostsGPU() instead.
     """
     
     __slots__ = ["t1", "t2", "_lambda", "_nu", "n", "m", "numSeries"]
@@ -35,8 +38,8 @@ class multiTWED():
         
         assert _nu >= 0, "Error: Set _nu >= 0!"
         
-        self.t1      = t1
-        self.t2      = t2
+        self.t1      = np.ascontiguousarray(t1, dtype=np.float64)
+        self.t2      = np.ascontiguousarray(t2, dtype=np.float64) #Every series contiguous in memory
         self._lambda = _lambda
         self._nu     = _nu
         
@@ -45,65 +48,169 @@ class multiTWED():
         self.numSeries = len(t2)
         
         assert len(t2.shape) == 2, f"Error: Pass t2 as matrix with shape (2, x)! Currently has shape {t2.shape}."
+        assert self.t2.shape[1] == self.n, f"Error, n != m!: {self.n}, {self.t2.shape[1]}"
+        assert self.n > 0, "Error: Pass non-empty time-series!"
         
-        #assert self.n == self.m, f"Error, n != m!: {self.n}, {self.m}"
         
+    def calculateCosts(self) -> np.array:
+        """
+        Calculates the resulting costs according to TWED (hence, dissimilarity between t1 and each series in t2).
+        Returns the costs as array of length numSeries.
         
-    def _init_matrix(self) -> np.array:
+        nu      = self._nu                    #Elasticity
+        n       = self.n                      #Number of timesteps in t1
+        m       = self.m                      #Number of timesteps in t2
+        lam     = self._lambda                #Penalty for deletion
+        t1_data = self.t1                     #Time-series data for t1 (array)
+        t2_data = self.t2                     #Time-series data for t2 (matrix)
+        """
+        return self._calculateCosts(self.n, self.m, self._nu, self._lambda, self.t1, self.t2)
+    
+    
+    @staticmethod
+    #No 'ninf'/'nnan' fastmath-flags: the DP relies on np.inf as boundary value
+    @njit("f8[::1](i8, i8, f8, f8, f8[::1], f8[:, ::1])", parallel=True, nogil=True, cache=True, fastmath={'nsz', 'arcp', 'contract', 'afn', 'reassoc'}, boundscheck=False)
+    def _calculateCosts(n, m, nu, lam, t1_data, t2_data) -> np.array:
         """
-        Initialize matrix for operations.
+        JIT-function wrapped by self.calculateCosts().
+        Every series of t2 is an independent DP (see memTWED), hence the series are distributed over the threads.
         """
-        matrix = np.zeros((self.numSeries, 2, self.n))
+        numSeries = t2_data.shape[0]
+        costs     = np.empty(numSeries, dtype=np.float64)
+        dt1       = np.abs(np.diff(t1_data))  #|t1[i-1] - t1[i]|
+        dt2       = np.abs(np.diff(t2_data))  #|t2[:, j-1] - t2[:, j]|
+        nu_lam    = nu + lam                  #Constant part of the deletion costs
+        two_nu    = 2*nu                      #Elasticity of the matching costs
         
-        matrix[:, 0, :] = np.inf
-        matrix[:, :, 0] = np.inf
-        matrix[:, 0, 0] = 0
+        for k in prange(numSeries):
+            series = t2_data[k]
+            dts    = dt2[k]
+            prev   = np.empty(n, dtype=np.float64) #DP (previous row)
+            curr   = np.empty(n, dtype=np.float64) #DP (current row)
+            
+            prev[0]  = 0
+            prev[1:] = np.inf
+            
+            for i in range(1, n):
+                curr[0] = np.inf
+                d1 = dt1[i-1] + nu_lam #Independent of j
+                
+                for j in range(1, m):
+                    
+                    _deleteA = (
+                                prev[j] + 
+                                d1
+                    )
+                    _deleteB = (
+                                curr[j-1] + 
+                                dts[j-1] +
+                                nu_lam
+                    )
+                    _match = (
+                                prev[j-1] + 
+                                abs(t1_data[i] - series[j]) +
+                                abs(t1_data[i-1] - series[j-1]) +
+                                two_nu*abs(i - j) #nu*(|i-j| + |(i-1)-(j-1)|)
+                    )
+                    _delete = _deleteA if _deleteA < _deleteB else _deleteB #Branchless min (minsd)
+                    curr[j] = _delete if _delete < _match else _match
+                
+                prev, curr = curr, prev #Swap rows
+            
+            costs[k] = prev[m-1]
         
-        return matrix
-
+        return costs    #-> Costs
+    
     
-    def calculateCosts(self) -> np.float:
+    def calculateCostsGPU(self, threadsPerBlock: int = 256, dtype: type = np.float32) -> np.array:
         """
-        Calculates the resulting costs according to TWED (hence, dissimilarity between t1 and t2).
-        Returns the costs.
+        Calculates the same costs as self.calculateCosts() on a CUDA device.
+        Every series of t2 is processed by one thread-block, whose threads compute the cells of an antidiagonal of the matrix in parallel.
+        Returns the costs as array of length numSeries.
+        
+        @threadsPerBlock: Maximal number of threads per block.
+        @dtype: Precision on the device. float32 is considerably faster on most devices, pass np.float64 to match self.calculateCosts().
         """
+        stream     = cuda.stream()
+        t1_data    = np.ascontiguousarray(self.t1, dtype=dtype)
+        t2_data    = np.ascontiguousarray(self.t2, dtype=dtype)
+        nu_lam     = dtype(self._nu + self._lambda)                            #Constant part of the deletion costs
+        elasticity = (2*self._nu*np.arange(max(self.n, self.m))).astype(dtype) #nu*(|i-j| + |(i-1)-(j-1)|), indexed by |i-j|
         
-        matrix  = self._init_matrix()         #DP
-        nu      = self._nu                    #Elasticity
-        lam     = self._lambda                #Penalty for deletion
-        t1_data = self.t1                     #Time-series data for t1 (array)
-        t2_data = self.t2                     #Time-series data for t2 (matrix)
-        _abs    = np.abs                      #Distance-measure (LP)
+        with cuda.pinned(t1_data), cuda.pinned(t2_data):
+            t1_data    = cuda.to_device(t1_data, stream=stream)
+            t2_data    = cuda.to_device(t2_data, stream=stream)
+            elasticity = cuda.to_device(elasticity, stream=stream)
+            diagonals  = cuda.device_array((self.numSeries, 3, self.n), dtype=dtype, stream=stream) #DP (last three antidiagonals)
+            costs      = cuda.device_array(self.numSeries, dtype=dtype, stream=stream)
+            
+            self._calculateCostsGPU[self.numSeries, min(self.n, threadsPerBlock), stream](
+                        self.n, self.m, nu_lam, elasticity, t1_data, t2_data, diagonals, costs
+            )
+            costs = costs.copy_to_host(stream=stream)
+            stream.synchronize()
         
+        return costs    #-> Costs
+    
+    
+    @staticmethod
+    @cuda.jit
+    def _calculateCostsGPU(n, m, nu_lam, elasticity, t1_data, t2_data, diagonals, costs) -> None:
+        """
+        CUDA-kernel wrapped by self.calculateCostsGPU().
+        Cell (i, j) only depends on the antidiagonals i+j-1 and i+j-2, hence the cells of one antidiagonal are independent.
+        The antidiagonals are stored in diagonals[k] (indexed by i) and rotate through its three rows.
+        All floating point values are passed in the precision of the device arrays, so that no float64 arithmetic is mixed in.
+        """
+        k      = cuda.blockIdx.x
+        tid    = cuda.threadIdx.x
+        step   = cuda.blockDim.x
+        series = t2_data[k]
+        D      = diagonals[k]
+        
+        for i in range(tid, n, step):
+            D[0, i] = np.inf
+            D[1, i] = np.inf
+            D[2, i] = np.inf
+        cuda.syncthreads()
+        
+        if tid == 0:
+            D[0, 0] = 0
+        cuda.syncthreads()
         
-        for i in range(1, self.n):
-            mi = i % 2 #Current Row
-            ai = abs(mi-1) #Previous Row
+        for d in range(2, n + m - 1):
+            c = d % 3       #Current antidiagonal
+            b = (d-1) % 3   #Previous antidiagonal
+            a = (d-2) % 3   #Antidiagonal before the previous one
             
-            for j in range(1, self.m):
+            if tid == 0:
+                D[c, 0] = np.inf     #Cell (0, d)
+                if d < n:
+                    D[c, d] = np.inf #Cell (d, 0)
+            
+            for i in range(max(1, d-m+1) + tid, min(n-1, d-1) + 1, step):
+                j = d - i
                 
                 _deleteA = (
-                            matrix[:, ai, j] +
-                            _abs(t1_data[i-1] - t1_data[i]) +
-                            nu*(i - (i-1)) + lam
+                            D[b, i-1] + 
+                            abs(t1_data[i-1] - t1_data[i]) +
+                            nu_lam
                 )
                 _deleteB = (
-                            matrix[:, mi, j-1] + 
-                            _abs(t2_data[:, j-1] - t2_data[:, j]) +
-                            nu*(j - (j-1)) + lam
+                            D[b, i] + 
+                            abs(series[j-1] - series[j]) +
+                            nu_lam
                 )
                 _match = (
-                            matrix[:, ai, j-1] +
-                            _abs(t1_data[i] - t2_data[:, j]) +
-                            _abs(t1_data[i-1] - t2_data[:, j-1]) +
-                            nu*(
-                                _abs(i - j) + 
-                                _abs((i-1) - (j-1))
-                            ) 
+                            D[a, i-1] + 
+                            abs(t1_data[i] - series[j]) +
+                            abs(t1_data[i-1] - series[j-1]) +
+                            elasticity[abs(i - j)]
                 )
-                matrix[:, mi, j] = np.min(np.stack((_deleteA, _deleteB, _match), axis=1), axis=1)
-            else:
-                matrix[:, 0, 0] = np.inf
+                _delete = _deleteA if _deleteA < _deleteB else _deleteB
+                D[c, i] = _delete if _delete < _match else _match
             
-
-        return matrix[:, mi, self.m-1]    #-> Costs
+            cuda.syncthreads()
+        
+        if tid == 0:
+            costs[k] = D[(n + m - 2) % 3, n-1]
@@ -1,4 +1,5 @@
 #Rather use the memory-efficient version provided under memoryEfficient_TWED.py!
+from numba import njit
 import numpy as np
 
 class TWED():
@@ -13,7 +14,7 @@ class TWED():
     Other variables:
     n: int, m: int -> length of t1, t2
     matrix: np.array with shape (n,m) -> Matrix for computation of the costs, whereby the low-right field matrix[n-1][m-1] contains the costs after computation.
-    t1_time: np.array, t2_time: np.array -> Time-stamps of t1, t2. This will be np.arange(1, n+1, 1), np.arange(1, m+1, 1) per default.
+    The time-stamps of t1, t2 are the indices i, j, hence the elasticity terms reduce to nu and nu*|i-j|.
     
     ____
     Use like:
@@ -32,8 +33,8 @@ class TWED():
         
         assert _nu >= 0, "Error: Set _nu >= 0!"
         
-        self.t1      = t1
-        self.t2      = t2
+        self.t1      = np.ascontiguousarray(t1, dtype=np.float64)
+        self.t2      = np.ascontiguousarray(t2, dtype=np.float64)
         self._lambda = _lambda
         self._nu     = _nu
         
@@ -45,55 +46,61 @@ class TWED():
         """
         Initialize matrix for operations.
         """
-        matrix = np.zeros((n, m))
+        matrix = np.zeros((n, m), dtype=np.float64)
         
-        for i in range(len(matrix)):
-            matrix[i][0] = np.inf
-            matrix[0][i] = np.inf
-            
-        matrix[0][0] = 0
+        matrix[0, :] = np.inf
+        matrix[:, 0] = np.inf
+        matrix[0, 0] = 0
         
         return matrix
 
     
-    def calculateCosts(self) -> np.float:
+    def calculateCosts(self) -> float:
         """
         Calculates the resulting costs according to TWED (hence, dissimilarity between t1 and t2).
         Returns the costs.
-        """
             
         matrix  = self._init_matrix(self.n, self.m) #DP
         nu      = self._nu                    #Elasticity
         lam     = self._lambda                #Penalty for deletion
         t1_data = self.t1                     #Time-series data for t1
         t2_data = self.t2                     #Time-series data for t2
-        t1_time = np.arange(1, self.n + 1, 1) #Time-stamps for t1
-        t2_time = np.arange(1, self.m + 1, 1) #Time-stamps for t2
-        _abs    = np.abs                      #Distance-measure (LP)
-        
+        """
+        return self._calculateCosts(self._init_matrix(self.n, self.m), self.n, self.m, self._nu, self._lambda, self.t1, self.t2)
+    
+    
+    @staticmethod
+    #No 'ninf'/'nnan' fastmath-flags: the DP relies on np.inf as boundary value
+    @njit("f8(f8[:, ::1], i8, i8, f8, f8, f8[::1], f8[::1])", nogil=True, cache=True, fastmath={'nsz', 'arcp', 'contract', 'afn', 'reassoc'}, boundscheck=False)
+    def _calculateCosts(matrix, n, m, nu, lam, t1_data, t2_data) -> float:
+        """
+        JIT-function wrapped by self.calculateCosts().
+        """
+        dt1    = np.abs(np.diff(t1_data))     #|t1[i-1] - t1[i]|
+        dt2    = np.abs(np.diff(t2_data))     #|t2[j-1] - t2[j]|
+        nu_lam = nu + lam                     #Constant part of the deletion costs
+        two_nu = 2*nu                         #Elasticity of the matching costs
         
-        for i in range(1, self.n):
-            for j in range(1, self.m):
-                #cost = _abs(t1_data[i] - t2_data[j]) #Irrelevant for computation, just added for completeness
+        for i in range(1, n):
+            for j in range(1, m):
+                #cost = abs(t1_data[i] - t2_data[j]) #Irrelevant for computation, just added for completeness
                 _deleteA = (
-                            matrix[i-1][j] + 
-                            _abs(t1_data[i-1] - t1_data[i]) +
-                            nu*(t1_time[i] - t1_time[i-1]) + lam
+                            matrix[i-1, j] + 
+                            dt1[i-1] +
+                            nu_lam
                 )
                 _deleteB = (
-                            matrix[i][j-1] + 
-                            _abs(t2_data[j-1] - t2_data[j]) +
-                            nu*(t2_time[j] - t2_time[j-1]) + lam
+                            matrix[i, j-1] + 
+                            dt2[j-1] +
+                            nu_lam
                 )
                 _match = (
-                            matrix[i-1][j-1] + 
-                            _abs(t1_data[i] - t2_data[j]) +
-                            _abs(t1_data[i-1] - t2_data[j-1]) +
-                            nu*(
-                                _abs(t1_time[i] - t2_time[j]) + 
-                                _abs(t1_time[i-1] - t2_time[j-1])
-                            ) 
+                            matrix[i-1, j-1] + 
+                            abs(t1_data[i] - t2_data[j]) +
+                            abs(t1_data[i-1] - t2_data[j-1]) +
+                            two_nu*abs(i - j) #nu*(|i-j| + |(i-1)-(j-1)|)
                 )
-                matrix[i][j] = min(_deleteA, _deleteB, _match)
+                _delete      = _deleteA if _deleteA < _deleteB else _deleteB #Branchless min (minsd)
+                matrix[i, j] = _delete if _delete < _match else _match
 
-        return matrix[self.n-1][self.m-1]    #-> Costs
+        return matrix[n-1, m-1]    #-> Costs